@@ -1,7 +1,9 @@
 #!/usr/bin/env python3
 import argparse
-import enum
+import concurrent.futures
+import functools
 import logging
+import operator
 import pathlib
 import sys
 import typing
@@ -27,173 +29,235 @@ class Config:
         logo_effect_kwargs: typing.Final[dict] = {}
 
 
-# helper for listing configurables
-class UnreadableValueStrategy(enum.Enum):
-    FALLBACK_TO_CONFIG = enum.auto()
-    QUESTION_MARK = enum.auto()
+# configurables: key, capability, getter, whether the capability is a get_/set_ pair
+# Each getter is a separate D-Bus method call; the daemon does not implement
+# org.freedesktop.DBus.Properties, so there is no GetAll to batch them with.
+_MOUSE_CONF_SPECS: typing.Final = (
+    ("dpi", "dpi", operator.attrgetter("dpi"), False),
+    ("dpi_stages", "dpi_stages", operator.attrgetter("dpi_stages"), False),
+    ("poll_rate", "poll_rate", operator.attrgetter("poll_rate"), False),
+    ("idle_time", "idle_time", operator.methodcaller("get_idle_time"), True),
+    (
+        "low_battery_threshold",
+        "low_battery_threshold",
+        operator.methodcaller("get_low_battery_threshold"),
+        True,
+    ),
+    (
+        "logo_brightness",
+        "lighting_logo",
+        operator.attrgetter("fx.misc.logo.brightness"),
+        False,
+    ),
+    ("logo_effect", "lighting_logo", operator.attrgetter("fx.misc.logo.effect"), False),
+)
+_MOUSE_CONF_GETTERS: typing.Final = {
+    key: getter for key, _, getter, *_ in _MOUSE_CONF_SPECS
+}
+
+
+def configurables_str(conf: dict[str, object]) -> str:
+    return ", ".join(f"{k}={v}" for k, v in conf.items())
 
 
 class Mouse:
     def __init__(self, device: openrazer.client.devices.mice.RazerMouse) -> None:
         self.device = device
-
-    def configurables_list(self, uvs: UnreadableValueStrategy) -> dict[str, object]:
-        conf = {}
-
-        def _with_getter(
-            capability: str,
-            getter: Callable[[openrazer.client.devices.mice.RazerMouse], object],
-        ) -> object | None:
-            if self.device.has(capability):
-                return getter(self.device)
-            return None
-
-        def _with_getter_setter(
-            capability: str,
-            getter: Callable[[openrazer.client.devices.mice.RazerMouse], object],
-            config_fallback: object,
-        ) -> object | None:
-            if self.device.has(f"get_{capability}"):
-                return getter(self.device)
-            if self.device.has(f"set_{capability}"):
-                match uvs:
-                    case UnreadableValueStrategy.FALLBACK_TO_CONFIG:
-                        return config_fallback
-                    case UnreadableValueStrategy.QUESTION_MARK:
-                        return "?"
-            return None
-
-        conf["dpi"] = _with_getter(
-            "dpi",
-            lambda d: d.dpi,
-        )
-        conf["dpi_stages"] = _with_getter(
-            "dpi_stages",
-            lambda d: d.dpi_stages,
-        )
-        conf["poll_rate"] = _with_getter(
-            "poll_rate",
-            lambda d: d.poll_rate,
-        )
-        conf["idle_time"] = _with_getter_setter(
-            "idle_time",
-            lambda d: d.get_idle_time(),
-            Config.Mouse.idle_time,
-        )
-        conf["low_battery_threshold"] = _with_getter_setter(
-            "low_battery_threshold",
-            lambda d: d.get_low_battery_threshold(),
-            Config.Mouse.low_battery_threshold,
-        )
-        conf["logo_brightness"] = _with_getter(
-            "lighting_logo",
-            lambda d: d.fx.misc.logo.brightness,
-        )
-        conf["logo_effect"] = _with_getter(
-            "lighting_logo",
-            lambda d: d.fx.misc.logo.effect,
-        )
-
-        return conf
-
-    def configurables_str(self, uvs: UnreadableValueStrategy) -> str:
-        return ", ".join(f"{k}={v}" for k, v in self.configurables_list(uvs).items())
-
-    def configure(self) -> None:
-        self.configure_dpi()
-        self.configure_dpi_stages()
-        self.configure_poll_rate()
-        self.configure_idle_time()
-        self.configure_low_battery_threshold()
-        self.configure_logo()
-
-    def configure_dpi(self) -> None:
-        if not self.device.has("dpi"):
+        # capabilities of a device do not change during the session
+        self._caps = frozenset(k for k, v in device.capabilities.items() if v)
+
+    # the nearest values supported by the device, hardware limits are read
+    # only when configuring
+    @functools.cached_property
+    def _target_dpi(self) -> int:
+        cfg = Config.Mouse
+        target_dpi = cfg.dpi
+        max_dpi = self.device.max_dpi if "dpi" in self._caps else None
+        if max_dpi is not None:
+            target_dpi = min(max_dpi, cfg.dpi)
+        if "available_dpi" in self._caps:
+            available_dpi = self.device.available_dpi
+            if available_dpi and target_dpi not in available_dpi:
+                target_dpi = min(available_dpi, key=lambda x: abs(x - cfg.dpi))
+        return target_dpi
+
+    @functools.cached_property
+    def _target_poll_rate(self) -> int:
+        cfg = Config.Mouse
+        if "supported_poll_rates" in self._caps:
+            poll_rates = self.device.supported_poll_rates
+            if poll_rates and cfg.poll_rate not in poll_rates:
+                return min(poll_rates, key=lambda x: abs(x - cfg.poll_rate))
+        return cfg.poll_rate
+
+    def configurables_list(self) -> dict[str, object]:
+        return {
+            key: self._configurable(capability, getter, paired=paired)
+            for key, capability, getter, paired in _MOUSE_CONF_SPECS
+        }
+
+    def _configurable(
+        self,
+        capability: str,
+        getter: Callable[[openrazer.client.devices.mice.RazerMouse], object],
+        *,
+        paired: bool,
+    ) -> object | None:
+        if paired:
+            return self._with_getter_setter(capability, getter)
+        return self._with_getter(capability, getter)
+
+    def _with_getter(
+        self,
+        capability: str,
+        getter: Callable[[openrazer.client.devices.mice.RazerMouse], object],
+    ) -> object | None:
+        if capability in self._caps:
+            return getter(self.device)
+        return None
+
+    def _with_getter_setter(
+        self,
+        capability: str,
+        getter: Callable[[openrazer.client.devices.mice.RazerMouse], object],
+    ) -> object | None:
+        if f"get_{capability}" in self._caps:
+            return getter(self.device)
+        if f"set_{capability}" in self._caps:
+            return "?"
+        return None
+
+    def configure(self) -> dict[str, object]:
+        # the returned state holds the values now set
+        state: dict[str, object] = dict.fromkeys(key for key, *_ in _MOUSE_CONF_SPECS)
+        self.configure_dpi(state)
+        self.configure_dpi_stages(state)
+        self.configure_poll_rate(state)
+        self.configure_idle_time(state)
+        self.configure_low_battery_threshold(state)
+        self.configure_logo(state)
+
+        # values left untouched are read as they are
+        for key, capability, getter, paired in _MOUSE_CONF_SPECS:
+            if state[key] is None:
+                state[key] = self._configurable(capability, getter, paired=paired)
+        return state
+
+    def _current(self, key: str) -> object:
+        return _MOUSE_CONF_GETTERS[key](self.device)
+
+    def configure_dpi(self, state: dict[str, object]) -> None:
+        if "dpi" not in self._caps:
             return
 
-        new_dpi = Config.Mouse.dpi
-
-        if self.device.max_dpi is not None:
-            new_dpi = min(self.device.max_dpi, Config.Mouse.dpi)
+        new_dpi = (self._target_dpi, self._target_dpi)
+        if self._current("dpi") != new_dpi:
+            self.device.dpi = new_dpi
+        state["dpi"] = new_dpi
 
-        if self.device.has("available_dpi"):
-            available_dpis = self.device.available_dpi
-            if available_dpis is not None and new_dpi not in available_dpis:
-                new_dpi = min(available_dpis, key=lambda x: abs(x - Config.Mouse.dpi))
-
-        if self.device.dpi != (new_dpi, new_dpi):
-            self.device.dpi = (new_dpi, new_dpi)
-
-    def configure_dpi_stages(self) -> None:
-        if not self.device.has("dpi_stages"):
+    def configure_dpi_stages(self, state: dict[str, object]) -> None:
+        if "dpi_stages" not in self._caps:
             return
 
-        if self.device.dpi_stages != (1, [(Config.Mouse.dpi, Config.Mouse.dpi)]):
-            self.device.dpi_stages = (1, [(Config.Mouse.dpi, Config.Mouse.dpi)])
+        cfg = Config.Mouse
+        new_dpi_stages = (1, [(cfg.dpi, cfg.dpi)])
+        if self._current("dpi_stages") != new_dpi_stages:
+            self.device.dpi_stages = new_dpi_stages
+        state["dpi_stages"] = new_dpi_stages
 
-    def configure_poll_rate(self) -> None:
-        if not self.device.has("poll_rate"):
+    def configure_poll_rate(self, state: dict[str, object]) -> None:
+        if "poll_rate" not in self._caps:
             return
 
-        new_poll_rate = Config.Mouse.poll_rate
+        poll_rate = self._current("poll_rate")
+        if poll_rate != self._target_poll_rate:
+            self.device.poll_rate = self._target_poll_rate
+        state["poll_rate"] = self._target_poll_rate
 
-        if self.device.has("supported_poll_rates"):
-            poll_rates = self.device.supported_poll_rates
-            if poll_rates is not None and Config.Mouse.poll_rate not in poll_rates:
-                new_poll_rate = min(
-                    poll_rates, key=lambda x: abs(x - Config.Mouse.poll_rate)
-                )
+    def configure_idle_time(self, state: dict[str, object]) -> None:
+        if "set_idle_time" not in self._caps:
+            return
 
-        if self.device.poll_rate != new_poll_rate:
-            self.device.poll_rate = new_poll_rate
+        cfg = Config.Mouse
+        if "get_idle_time" in self._caps:
+            idle_time = self._current("idle_time")
+            if idle_time != cfg.idle_time:
+                self.device.set_idle_time(cfg.idle_time)
+        else:
+            self.device.set_idle_time(cfg.idle_time)
+        state["idle_time"] = cfg.idle_time
 
-    def configure_idle_time(self) -> None:
-        if not self.device.has("set_idle_time"):
+    def configure_low_battery_threshold(self, state: dict[str, object]) -> None:
+        if "set_low_battery_threshold" not in self._caps:
             return
 
-        if self.device.has("get_idle_time"):
-            if self.device.get_idle_time() != Config.Mouse.idle_time:
-                self.device.set_idle_time(Config.Mouse.idle_time)
+        cfg = Config.Mouse
+        if "get_low_battery_threshold" in self._caps:
+            low_battery_threshold = self._current("low_battery_threshold")
+            if low_battery_threshold != cfg.low_battery_threshold:
+                self.device.set_low_battery_threshold(cfg.low_battery_threshold)
         else:
-            self.device.set_idle_time(Config.Mouse.idle_time)
+            self.device.set_low_battery_threshold(cfg.low_battery_threshold)
+        state["low_battery_threshold"] = cfg.low_battery_threshold
 
-    def configure_low_battery_threshold(self) -> None:
-        if not self.device.has("set_low_battery_threshold"):
+    def configure_logo(self, state: dict[str, object]) -> None:
+        if "lighting_logo" not in self._caps:
             return
 
-        if self.device.has("get_low_battery_threshold"):
-            if (
-                self.device.get_low_battery_threshold()
-                != Config.Mouse.low_battery_threshold
-            ):
-                self.device.set_low_battery_threshold(
-                    Config.Mouse.low_battery_threshold
-                )
-        else:
-            self.device.set_low_battery_threshold(Config.Mouse.low_battery_threshold)
+        cfg = Config.Mouse
+        will_write_brightness = False
+        will_write_effect = False
+
+        if "lighting_logo_brightness" in self._caps:
+            will_write_brightness = (
+                self._current("logo_brightness") != cfg.logo_brightness
+            )
+            state["logo_brightness"] = cfg.logo_brightness
 
-    def configure_logo(self) -> None:
-        if not self.device.has("lighting_logo"):
+        if f"lighting_logo_{cfg.logo_effect}" in self._caps:
+            will_write_effect = self._current("logo_effect") != cfg.logo_effect
+            state["logo_effect"] = cfg.logo_effect
+
+        if not will_write_brightness and not will_write_effect:
             return
 
         # https://github.com/openrazer/openrazer/blob/v3.9.0/examples/basic_effect.py#L13
         self.device.sync_effects = False
 
-        if (
-            self.device.has("lighting_logo_brightness")
-            and self.device.fx.misc.logo.brightness != Config.Mouse.logo_brightness
-        ):
-            self.device.fx.misc.logo.brightness = Config.Mouse.logo_brightness
-
-        if (
-            self.device.has(f"lighting_logo_{Config.Mouse.logo_effect}")
-            and self.device.fx.misc.logo.effect != Config.Mouse.logo_effect
-        ):
-            getattr(self.device.fx.misc.logo, Config.Mouse.logo_effect)(
-                *Config.Mouse.logo_effect_args, **Config.Mouse.logo_effect_kwargs
+        if will_write_brightness:
+            self.device.fx.misc.logo.brightness = cfg.logo_brightness
+
+        if will_write_effect:
+            getattr(self.device.fx.misc.logo, cfg.logo_effect)(
+                *cfg.logo_effect_args, **cfg.logo_effect_kwargs
             )
 
 
+def process_device(device: openrazer.client.devices.RazerDevice, *, dry: bool) -> None:
+    lines = [
+        f"{device.name}",
+        (
+            f"  type: {device.type}, "
+            f"serial: {device.serial}, firmware version: {device.firmware_version}, "
+            f"driver version: {device.driver_version}, "
+            f"battery level: {device.battery_level}, is charging: {device.is_charging}"
+        ),
+    ]
+
+    if device.type == "mouse":
+        mouse = Mouse(device)
+
+        if dry:
+            configurables = configurables_str(mouse.configurables_list())
+            lines.append(f"  configurables found: {configurables}")
+        else:
+            configurables = configurables_str(mouse.configure())
+            lines.append(f"  configurables now:   {configurables}")
+
+    # devices are processed concurrently, a single record keeps their lines together
+    logging.info("%s", "\n".join(lines))
+
+
 def main() -> int:
     logging.basicConfig(
         level=logging.INFO,
@@ -211,36 +275,13 @@ def main() -> int:
     args = args_parser.parse_args()
 
     device_manager = openrazer.client.DeviceManager()
+    devices = list(device_manager.devices)
 
-    for device in device_manager.devices:
-        logging.info("%s", device.name)
-        logging.info(
-            "  type: %s, "
-            "serial: %s, firmware version: %s, driver version: %s, "
-            "battery level: %s, is charging: %s",
-            device.type,
-            device.serial,
-            device.firmware_version,
-            device.driver_version,
-            device.battery_level,
-            device.is_charging,
-        )
-
-        if device.type == "mouse":
-            mouse = Mouse(device)
-
-            configurables = mouse.configurables_str(
-                UnreadableValueStrategy.QUESTION_MARK
-            )
-            logging.info("  configurables found: %s", configurables)
-
-            if not args.dry:
-                mouse.configure()
-
-                configurables = mouse.configurables_str(
-                    UnreadableValueStrategy.FALLBACK_TO_CONFIG
-                )
-                logging.info("  configurables now:   %s", configurables)
+    # the work is bound by D-Bus calls, so the devices are handled concurrently
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=max(len(devices), 1)
+    ) as executor:
+        list(executor.map(functools.partial(process_device, dry=args.dry), devices))
 
     return 0
 